@@ -0,0 +1,46 @@
+#!/bin/sh
+# SPDX-FileCopyrightText: 2024 RotaryUsb Project
+# SPDX-License-Identifier: Apache-2.0
+#
+# Precompile the CircuitPython firmware to .mpy bytecode with mpy-cross.
+#
+# Usage: ./build_mpy.sh [keyboard|generic]
+#
+# CircuitPython only runs code.py from source, so the firmware is compiled
+# to rotaryusb.mpy and paired with a two-line code.py that imports it.
+# Copy the contents of build/<mode>/ to the root of the CIRCUITPY drive.
+#
+# mpy-cross must match the major version of CircuitPython on the board.
+
+set -e
+
+MODE="${1:-keyboard}"
+cd "$(dirname "$0")"
+
+case "$MODE" in
+    keyboard) SRC=code.py ;;
+    generic)  SRC=code_generic_hid.py ;;
+    *)
+        echo "Usage: $0 [keyboard|generic]" >&2
+        exit 1
+        ;;
+esac
+
+OUT="build/$MODE"
+mkdir -p "$OUT"
+
+# -O3 strips assertions and line numbers; const() debug branches are
+# removed at compile time when _DEBUG = const(0)
+mpy-cross -O3 -o "$OUT/rotaryusb.mpy" "$SRC"
+
+cat > "$OUT/code.py" <<'LOADER'
+# Runs the precompiled RotaryUsb firmware (see firmware/build_mpy.sh)
+from rotaryusb import main
+main()
+LOADER
+
+if [ "$MODE" = "generic" ]; then
+    cp boot.py "$OUT/boot.py"
+fi
+
+echo "Built $SRC -> $OUT/rotaryusb.mpy"
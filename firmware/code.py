@@ -5,13 +5,16 @@ CircuitPython firmware for Raspberry Pi Pico
 Reads 4 rotary encoders with push buttons and sends USB HID keyboard events.
 
 Copy this file to the CIRCUITPY drive as code.py after installing CircuitPython
-and the adafruit_hid library.
+and the adafruit_hid, adafruit_pioasm, asyncio and adafruit_ticks libraries.
 """
 
-import time
+import array
+import asyncio
 import board
-import digitalio
+import rp2pio
+import adafruit_pioasm
 import usb_hid
+from micropython import const
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keycode import Keycode
 
@@ -20,31 +23,214 @@ from adafruit_hid.keycode import Keycode
 # ============================================================================
 
 # GPIO Pin mapping for 4 encoders
-# Each encoder has: A (CLK), B (DT), SW (Button)
-ENCODER_PINS = [
-    {"a": board.GP2, "b": board.GP3, "sw": board.GP4},   # Encoder 1
-    {"a": board.GP5, "b": board.GP6, "sw": board.GP7},   # Encoder 2
-    {"a": board.GP8, "b": board.GP9, "sw": board.GP10},  # Encoder 3
-    {"a": board.GP11, "b": board.GP12, "sw": board.GP13}, # Encoder 4
-]
-
-# Key mappings for each encoder
+# All encoder pins form one contiguous block starting at PIN_BASE so the whole
+# bank can be sampled with a single PIO read.
+# Each encoder has: A (CLK), B (DT), SW (Button) on consecutive pins, so
+# encoder i uses pins PIN_BASE + 3*i .. PIN_BASE + 3*i + 2:
+#   Encoder 1: GP2, GP3, GP4      Encoder 3: GP8, GP9, GP10
+#   Encoder 2: GP5, GP6, GP7      Encoder 4: GP11, GP12, GP13
+PIN_BASE = board.GP2
+# The encoder count is fixed at 4: the sampler program reads exactly 12 pins
+# ("in pins, 12"), ButtonDebouncer has one lane per button, and the tasks
+# unroll the encoders into e0..e3, so PIN_COUNT must stay 12.
+PIN_COUNT = 12
+
+# Key mappings for each encoder: (cw_key, ccw_key, btn_key)
 # cw_key: Keycode sent on clockwise rotation
 # ccw_key: Keycode sent on counter-clockwise rotation
 # btn_key: Keycode sent on button press
-KEY_MAPPINGS = [
-    {"cw_key": Keycode.F1, "ccw_key": Keycode.F2, "btn_key": Keycode.F9},   # Encoder 1
-    {"cw_key": Keycode.F3, "ccw_key": Keycode.F4, "btn_key": Keycode.F10},  # Encoder 2
-    {"cw_key": Keycode.F5, "ccw_key": Keycode.F6, "btn_key": Keycode.F11},  # Encoder 3
-    {"cw_key": Keycode.F7, "ccw_key": Keycode.F8, "btn_key": Keycode.F12},  # Encoder 4
-]
+KEY_MAPPINGS = (
+    (Keycode.F1, Keycode.F2, Keycode.F9),   # Encoder 1
+    (Keycode.F3, Keycode.F4, Keycode.F10),  # Encoder 2
+    (Keycode.F5, Keycode.F6, Keycode.F11),  # Encoder 3
+    (Keycode.F7, Keycode.F8, Keycode.F12),  # Encoder 4
+)
+
+# Task timing (in seconds)
+POLL_INTERVAL = 0.001  # 1ms between encoder/button polls
+REPORT_INTERVAL = 0.010  # 10ms between rotation key bursts
+
+# Button debounce: a button changes state only after BUTTON_DEBOUNCE_SAMPLES
+# consecutive matching samples, taken every BUTTON_SAMPLE_POLLS polls
+# (5 samples x 4 polls x 1ms = about 20ms of stable contact)
+BUTTON_DEBOUNCE_SAMPLES = 5  # 1 to 6
+BUTTON_SAMPLE_POLLS = 4
+
+# Debug output to serial console (1 = enabled, 0 = disabled)
+# This is a compile-time constant: with 0 every debug branch, including its
+# string formatting, is removed when the file is compiled.
+_DEBUG = const(1)
+
+# ============================================================================
+# PIN SAMPLER
+# ============================================================================
+
+# PIO clock for the pin sampler. An unchanged sample takes 5 cycles, so the
+# pins are checked at 20 kHz - far faster than any hand-turned encoder.
+SAMPLER_FREQUENCY = 100_000
+
+# PIO program that watches all encoder pins and pushes a snapshot into the
+# RX FIFO every time any of them changes. The pins are inverted (they are
+# active-low) and packed into the low 12 bits of the word with PIN_BASE in
+# bit 0; the upper bits are always zero, so every snapshot stays a small int.
+# Y holds the last pushed snapshot. It starts as all ones, which no 12-bit
+# snapshot can match, so the first sample is always pushed.
+# The RX FIFO buffers up to 4 changes. If the CPU has not drained it by
+# then, the state machine stalls in "push block" and stops sampling, so
+# edges during the stall are lost; the poll task drains the FIFO every
+# POLL_INTERVAL to keep that from happening at hand-turning speeds.
+SAMPLER_PROGRAM = adafruit_pioasm.assemble("""
+    mov y, ~null
+sample:
+    mov isr, ~null
+    in pins, 12
+    mov x, ~isr
+    jmp x!=y changed
+    jmp sample
+changed:
+    mov y, x
+    mov isr, x
+    push block
+    jmp sample
+""")
 
-# Debounce timing (in seconds)
-BUTTON_DEBOUNCE_TIME = 0.020  # 20ms debounce for buttons
-LOOP_DELAY = 0.001  # 1ms loop delay
 
-# Debug output to serial console
-DEBUG_ENABLED = True
+def create_pin_sampler():
+    """
+    Create the PIO state machine that captures every encoder pin change.
+    
+    The first snapshot is pushed as soon as the state machine starts.
+    
+    Returns:
+        rp2pio.StateMachine with pull-ups enabled on all encoder pins
+    """
+    return rp2pio.StateMachine(
+        SAMPLER_PROGRAM,
+        frequency=SAMPLER_FREQUENCY,
+        first_in_pin=PIN_BASE,
+        in_pin_count=PIN_COUNT,
+        pull_in_pin_up=(1 << PIN_COUNT) - 1,
+        in_shift_right=False,
+    )
+
+
+# ============================================================================
+# BUTTON DEBOUNCER
+# ============================================================================
+
+# History layout: each button gets a lane of BUTTON_DEBOUNCE_SAMPLES sample
+# bits plus one spare carry bit, and lane i starts at bit i * _LANE. With at
+# most 6 samples the whole word stays below bit 30, i.e. a small int.
+_LANE = BUTTON_DEBOUNCE_SAMPLES + 1
+_LANE_2 = 2 * _LANE
+_LANE_3 = 3 * _LANE
+_LANE_LSB = 1 | (1 << _LANE) | (1 << _LANE_2) | (1 << _LANE_3)
+_LANE_SAMPLES = ((1 << BUTTON_DEBOUNCE_SAMPLES) - 1) * _LANE_LSB
+_LANE_CARRY = _LANE_LSB << BUTTON_DEBOUNCE_SAMPLES
+# Shifts that move lane i's carry bit down to bit i
+_PACK_1 = _LANE + BUTTON_DEBOUNCE_SAMPLES - 1
+_PACK_2 = _LANE_2 + BUTTON_DEBOUNCE_SAMPLES - 2
+_PACK_3 = _LANE_3 + BUTTON_DEBOUNCE_SAMPLES - 3
+
+
+class ButtonDebouncer:
+    """
+    Debounces all 4 encoder push buttons at once.
+    
+    Each button keeps a shift register of its last BUTTON_DEBOUNCE_SAMPLES
+    samples in one lane of a single int, so every button is updated with
+    the same handful of bitwise operations. A sample is taken every
+    BUTTON_SAMPLE_POLLS polls, and a button only changes state once all
+    of its samples agree.
+    """
+    
+    def __init__(self):
+        """Initialize with every button released."""
+        self.history = 0  # Lane i holds the sample history of button i
+        self.stable = 0   # Carry bit of lane i is set while button i is pressed
+        self.pressed = 0  # Bit i is set while button i is pressed
+        self._countdown = BUTTON_SAMPLE_POLLS
+    
+    def update(self, state):
+        """
+        Shift the latest pin snapshot into every button's history.
+        
+        Should be called once per poll; only every BUTTON_SAMPLE_POLLS-th
+        call takes a sample, so the debounce time is independent of how
+        often the encoders are polled.
+        
+        Args:
+            state: Sampled pin word (SW of encoder i at bit 3*i + 2)
+        
+        Returns:
+            Bitmask of buttons whose debounced state changed (bit i = button i)
+        """
+        countdown = self._countdown - 1
+        if countdown:
+            self._countdown = countdown
+            return 0
+        self._countdown = BUTTON_SAMPLE_POLLS
+        
+        # Move each SW bit to bit 0 of its lane, then shift every lane's
+        # history by one sample, dropping the oldest
+        bits = (((state >> 2) & 1) | (((state >> 5) & 1) << _LANE) |
+                (((state >> 8) & 1) << _LANE_2) | (((state >> 11) & 1) << _LANE_3))
+        history = ((self.history << 1) & _LANE_SAMPLES) | bits
+        self.history = history
+        
+        # Adding 1 to a lane carries out only if every sample is pressed;
+        # adding all ones carries out if any sample is pressed
+        all_on = (history + _LANE_LSB) & _LANE_CARRY
+        any_on = (history + _LANE_SAMPLES) & _LANE_CARRY
+        
+        # Buttons only change state once their history is unanimous
+        stable = (self.stable | all_on) & any_on
+        self.stable = stable
+        
+        # Pack the carry bit of each lane into a 4-bit mask
+        pressed = (((stable >> BUTTON_DEBOUNCE_SAMPLES) & 1) | ((stable >> _PACK_1) & 2) |
+                   ((stable >> _PACK_2) & 4) | ((stable >> _PACK_3) & 8))
+        changed = pressed ^ self.pressed
+        self.pressed = pressed
+        
+        if _DEBUG:
+            if changed:
+                for i in range(4):
+                    if changed & (1 << i):
+                        action = "pressed" if pressed & (1 << i) else "released"
+                        print(f"Encoder {i + 1}: Button {action}")
+        
+        return changed
+
+
+# ============================================================================
+# KEYBOARD REPORTS
+# ============================================================================
+
+# Keyboard report with no keys held, sent after every key press
+RELEASE_REPORT = bytes(8)
+
+
+def build_key_report(keycode):
+    """
+    Build the 8-byte keyboard report for holding a single key.
+    
+    Reports are built once at startup and sent directly to the keyboard
+    device, skipping adafruit_hid's per-keystroke report encoding.
+    
+    Args:
+        keycode: Keycode to hold (modifier keys go in the modifier byte)
+    
+    Returns:
+        bytearray: [Modifiers][Reserved][Key1]..[Key6]
+    """
+    report = bytearray(8)
+    if Keycode.LEFT_CONTROL <= keycode <= Keycode.RIGHT_GUI:
+        report[0] = 1 << (keycode - Keycode.LEFT_CONTROL)
+    else:
+        report[2] = keycode
+    return report
+
 
 # ============================================================================
 # ENCODER CLASS
@@ -54,147 +240,205 @@ class Encoder:
     """
     Handles a single rotary encoder with push button.
     
-    Uses quadrature decoding to detect rotation direction and
-    software debouncing for the push button.
+    Uses quadrature decoding to detect rotation direction. The push
+    button is debounced separately by ButtonDebouncer.
     """
     
-    # Quadrature state transition table
-    # Maps (previous_state, current_state) to direction
-    # +1 = clockwise, -1 = counter-clockwise, 0 = no valid transition
-    TRANSITION_TABLE = {
-        (0b00, 0b01): +1,
-        (0b01, 0b11): +1,
-        (0b11, 0b10): +1,
-        (0b10, 0b00): +1,
-        (0b00, 0b10): -1,
-        (0b10, 0b11): -1,
-        (0b11, 0b01): -1,
-        (0b01, 0b00): -1,
-    }
-    
-    def __init__(self, pin_a, pin_b, pin_sw, cw_key, ccw_key, btn_key, keyboard, encoder_id=0):
+    # Quadrature state transition lookup table
+    # Indexed by (previous_state << 2) | current_state, where each state
+    # is (B << 1) | A as read straight from the sampled pin word
+    # 0x01 = clockwise, 0xFF = counter-clockwise, 0x00 = no valid transition
+    _QDEC_LUT = bytes([
+        0x00, 0xFF, 0x01, 0x00,  # from 0b00
+        0x01, 0x00, 0x00, 0xFF,  # from 0b01
+        0xFF, 0x00, 0x00, 0x01,  # from 0b10
+        0x00, 0x01, 0xFF, 0x00,  # from 0b11
+    ])
+    
+    def __init__(self, index, cw_key, ccw_key, btn_key, kbd_send, state):
         """
         Initialize an encoder instance.
         
         Args:
-            pin_a: GPIO pin for encoder A (CLK)
-            pin_b: GPIO pin for encoder B (DT)
-            pin_sw: GPIO pin for encoder push button (SW)
+            index: Zero-based encoder number; pin A is at bit 3*index of
+                the sampled pin word and B at the following bit
             cw_key: Keycode to send on clockwise rotation
             ccw_key: Keycode to send on counter-clockwise rotation
             btn_key: Keycode to send on button press
-            keyboard: Keyboard instance for sending HID events
-            encoder_id: Identifier for debug output
+            kbd_send: Bound send_report method of the keyboard HID device
+            state: Initial sampled pin word
         """
-        self.encoder_id = encoder_id
-        self.keyboard = keyboard
-        
-        # Key mappings
-        self.cw_key = cw_key
-        self.ccw_key = ccw_key
-        self.btn_key = btn_key
+        self.encoder_id = index + 1  # For debug output
+        self._kbd_send = kbd_send
         
-        # Initialize pin A
-        self.pin_a = digitalio.DigitalInOut(pin_a)
-        self.pin_a.direction = digitalio.Direction.INPUT
-        self.pin_a.pull = digitalio.Pull.UP
+        # Pre-built key press reports for each event
+        self._cw_press = build_key_report(cw_key)
+        self._ccw_press = build_key_report(ccw_key)
+        self._btn_press = build_key_report(btn_key)
         
-        # Initialize pin B
-        self.pin_b = digitalio.DigitalInOut(pin_b)
-        self.pin_b.direction = digitalio.Direction.INPUT
-        self.pin_b.pull = digitalio.Pull.UP
-        
-        # Initialize button pin
-        self.pin_sw = digitalio.DigitalInOut(pin_sw)
-        self.pin_sw.direction = digitalio.Direction.INPUT
-        self.pin_sw.pull = digitalio.Pull.UP
+        # Bit position within the sampled pin word
+        self._bit_offset = 3 * index
+        # Bit of this encoder's button in ButtonDebouncer masks
+        self._btn_bit = 1 << index
         
         # Encoder state tracking
-        # Read initial state (inverted because active-low)
-        self.last_ab_state = self._read_ab_state()
+        self.last_ab_state = (state >> self._bit_offset) & 0b11
         # Accumulated steps - most encoders have 4 state changes per detent
         # (adjust threshold in update() if your encoder behaves differently)
         self.steps = 0
-        
-        # Button state tracking
-        self.last_button_state = self.pin_sw.value  # True = not pressed (pull-up)
-        self.button_pressed = False
-        self.last_button_time = time.monotonic()
-    
-    def _read_ab_state(self):
-        """Read current A/B state as 2-bit value."""
-        # Pins are active-low, so invert the reading
-        a_val = 0 if self.pin_a.value else 1
-        b_val = 0 if self.pin_b.value else 1
-        return (a_val << 1) | b_val
+        # Net detents since the last send_movement() (positive = CW)
+        self.accumulated_movement = 0
     
-    def update(self):
+    def update(self, state):
         """
-        Update encoder state and send HID events if needed.
+        Decode rotation from a captured pin snapshot.
         
-        Should be called frequently in the main loop.
-        Returns True if an event was sent.
+        Should be called for every snapshot drained from the pin sampler.
+        Completed detents are accumulated until send_movement().
         """
-        event_sent = False
+        # Every self.x access is a dict lookup in CircuitPython, so read
+        # attributes into locals once and write back only what changed
+        last_ab_state = self.last_ab_state
         
         # Process encoder rotation
-        current_ab_state = self._read_ab_state()
+        # The sampler already inverted the active-low pins
+        current_ab_state = (state >> self._bit_offset) & 0b11
         
-        if current_ab_state != self.last_ab_state:
+        if current_ab_state != last_ab_state:
             # Look up transition in table
-            transition = (self.last_ab_state, current_ab_state)
-            direction = self.TRANSITION_TABLE.get(transition, 0)
+            direction = self._QDEC_LUT[(last_ab_state << 2) | current_ab_state]
             
-            if direction != 0:
-                self.steps += direction
+            if direction:
+                if direction == 0xFF:
+                    direction = -1
+                steps = self.steps + direction
                 
                 # Most encoders have 4 state changes per detent
-                # Send key event when a full detent is completed
-                if self.steps >= 4:
-                    self._send_key(self.cw_key, "CW")
-                    self.steps = 0
-                    event_sent = True
-                elif self.steps <= -4:
-                    self._send_key(self.ccw_key, "CCW")
-                    self.steps = 0
-                    event_sent = True
+                # Accumulate movement when a full detent is completed
+                if steps >= 4:
+                    self.accumulated_movement += 1
+                    steps = 0
+                elif steps <= -4:
+                    self.accumulated_movement -= 1
+                    steps = 0
+                
+                self.steps = steps
             
             self.last_ab_state = current_ab_state
+    
+    async def send_movement(self):
+        """
+        Send the keys for the detents accumulated since the last call.
         
-        # Process button press with debounce
-        current_button_state = self.pin_sw.value
-        current_time = time.monotonic()
+        Detents within one REPORT_INTERVAL are coalesced: opposite turns
+        cancel out and the net count is sent as a burst of presses of the
+        CW or CCW key. Each send_report() blocks until the host has taken
+        the report, so the burst yields after every key to let poll_loop()
+        keep draining the pin sampler; detents that arrive meanwhile are
+        accumulated for the next call.
+        """
+        movement = self.accumulated_movement
+        if movement:
+            self.accumulated_movement = 0
+            if movement > 0:
+                for _ in range(movement):
+                    self._send_key(self._cw_press, "CW")
+                    await asyncio.sleep(0)
+            else:
+                for _ in range(-movement):
+                    self._send_key(self._ccw_press, "CCW")
+                    await asyncio.sleep(0)
+    
+    def update_button(self, presses):
+        """
+        Send the button key if this encoder's button was just pressed.
         
-        # Button is active-low (pressed = False/low)
-        if current_button_state != self.last_button_state:
-            if (current_time - self.last_button_time) >= BUTTON_DEBOUNCE_TIME:
-                self.last_button_time = current_time
-                self.last_button_state = current_button_state
-                
-                # Detect falling edge (button press)
-                if not current_button_state and not self.button_pressed:
-                    self.button_pressed = True
-                    self._send_key(self.btn_key, "BTN")
-                    event_sent = True
-                # Detect rising edge (button release)
-                elif current_button_state and self.button_pressed:
-                    self.button_pressed = False
-                    if DEBUG_ENABLED:
-                        print(f"Encoder {self.encoder_id}: Button released")
-        
-        return event_sent
-    
-    def _send_key(self, keycode, event_type):
-        """Send a keyboard key press and release."""
+        Args:
+            presses: Bitmask of newly debounced presses from ButtonDebouncer
+        """
+        if presses & self._btn_bit:
+            self._send_key(self._btn_press, "BTN")
+    
+    def _send_key(self, press_report, event_type):
+        """Send a pre-built key press report followed by a release."""
         try:
-            self.keyboard.send(keycode)
-            if DEBUG_ENABLED:
+            kbd_send = self._kbd_send
+            kbd_send(press_report)
+            kbd_send(RELEASE_REPORT)
+            if _DEBUG:
                 print(f"Encoder {self.encoder_id}: {event_type} -> Key sent")
         except Exception as e:
-            if DEBUG_ENABLED:
+            if _DEBUG:
                 print(f"Encoder {self.encoder_id}: Error sending key: {e}")
 
 
+# ============================================================================
+# TASKS
+# ============================================================================
+
+async def poll_loop(sampler, sample, encoders, buttons):
+    """
+    Decode encoder snapshots and handle buttons every POLL_INTERVAL.
+    
+    Args:
+        sampler: Pin sampler state machine from create_pin_sampler()
+        sample: One-word array holding the latest pin snapshot
+        encoders: List of Encoder instances
+        buttons: ButtonDebouncer for the encoder push buttons
+    """
+    # The firmware always drives exactly 4 encoders, so the hot loop calls
+    # them directly instead of iterating
+    e0, e1, e2, e3 = encoders
+    
+    while True:
+        # Decode every snapshot the sampler buffered since the last poll
+        while sampler.in_waiting:
+            sampler.readinto(sample)
+            state = sample[0]
+            e0.update(state)
+            e1.update(state)
+            e2.update(state)
+            e3.update(state)
+        
+        # Debounce all buttons from the latest snapshot
+        new_presses = buttons.update(sample[0]) & buttons.pressed
+        if new_presses:
+            e0.update_button(new_presses)
+            e1.update_button(new_presses)
+            e2.update_button(new_presses)
+            e3.update_button(new_presses)
+        
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def report_loop(encoders):
+    """
+    Send the rotation keys accumulated by each encoder every REPORT_INTERVAL.
+    
+    Args:
+        encoders: List of Encoder instances updated by poll_loop()
+    """
+    e0, e1, e2, e3 = encoders
+    
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        
+        await e0.send_movement()
+        await e1.send_movement()
+        await e2.send_movement()
+        await e3.send_movement()
+
+
+async def run_tasks(sampler, sample, encoders, buttons):
+    """Run the polling and reporting tasks side by side."""
+    # CircuitPython asyncio is cooperative and single-threaded, so the
+    # shared encoders and debouncer need no locking
+    await asyncio.gather(
+        asyncio.create_task(poll_loop(sampler, sample, encoders, buttons)),
+        asyncio.create_task(report_loop(encoders)),
+    )
+
+
 # ============================================================================
 # MAIN PROGRAM
 # ============================================================================
@@ -202,43 +446,46 @@ class Encoder:
 def main():
     """Main entry point."""
     print("RotaryUsb Encoder Firmware Starting...")
-    print(f"Debug output: {'Enabled' if DEBUG_ENABLED else 'Disabled'}")
+    print(f"Debug output: {'Enabled' if _DEBUG else 'Disabled'}")
     
     # Initialize USB HID Keyboard
     try:
         keyboard = Keyboard(usb_hid.devices)
+        # Encoders send pre-built reports through the underlying device,
+        # so resolve its send_report method once here
+        kbd_send = keyboard._keyboard_device.send_report
         print("USB HID Keyboard initialized")
     except Exception as e:
         print(f"Failed to initialize keyboard: {e}")
         print("Make sure usb_hid is enabled in boot.py")
         return
     
+    # Initialize the PIO pin sampler and wait for its first snapshot
+    sampler = create_pin_sampler()
+    sample = array.array("L", [0])
+    sampler.readinto(sample)
+    print(f"Pin sampler initialized: {PIN_COUNT} pins from {PIN_BASE}")
+    
+    buttons = ButtonDebouncer()
+    
     # Create encoder instances
     encoders = []
-    for i, (pins, keys) in enumerate(zip(ENCODER_PINS, KEY_MAPPINGS)):
+    for i, (cw_key, ccw_key, btn_key) in enumerate(KEY_MAPPINGS):
         encoder = Encoder(
-            pin_a=pins["a"],
-            pin_b=pins["b"],
-            pin_sw=pins["sw"],
-            cw_key=keys["cw_key"],
-            ccw_key=keys["ccw_key"],
-            btn_key=keys["btn_key"],
-            keyboard=keyboard,
-            encoder_id=i + 1
+            index=i,
+            cw_key=cw_key,
+            ccw_key=ccw_key,
+            btn_key=btn_key,
+            kbd_send=kbd_send,
+            state=sample[0]
         )
         encoders.append(encoder)
-        print(f"Encoder {i + 1} initialized: A={pins['a']}, B={pins['b']}, SW={pins['sw']}")
+        print(f"Encoder {i + 1} initialized: A=bit {3 * i}, B=bit {3 * i + 1}, SW=bit {3 * i + 2}")
     
-    print("All encoders initialized. Starting main loop...")
+    print("All encoders initialized. Starting tasks...")
     print("-" * 40)
     
-    # Main loop
-    while True:
-        for encoder in encoders:
-            encoder.update()
-        
-        # Small delay to prevent CPU hogging
-        time.sleep(LOOP_DELAY)
+    asyncio.run(run_tasks(sampler, sample, encoders, buttons))
 
 
 # Run the main program
@@ -12,7 +12,7 @@ PREREQUISITES:
 - Power cycle the device before copying this file
 
 Copy this file to the CIRCUITPY drive as code.py after installing CircuitPython
-and the adafruit_hid library.
+and the adafruit_hid, adafruit_pioasm, asyncio and adafruit_ticks libraries.
 
 HID REPORT FORMAT (8 bytes total):
   Byte 0: Report ID (0x01 - handled by send_report)
@@ -25,31 +25,187 @@ HID REPORT FORMAT (8 bytes total):
   Byte 7: Reserved (0x00)
 """
 
-import time
+import array
+import asyncio
 import board
-import digitalio
+import rp2pio
+import adafruit_pioasm
 import usb_hid
+from micropython import const
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 # GPIO Pin mapping for 4 encoders
-# Each encoder has: A (CLK), B (DT), SW (Button)
-ENCODER_PINS = [
-    {"a": board.GP2, "b": board.GP3, "sw": board.GP4},   # Encoder 1
-    {"a": board.GP5, "b": board.GP6, "sw": board.GP7},   # Encoder 2
-    {"a": board.GP8, "b": board.GP9, "sw": board.GP10},  # Encoder 3
-    {"a": board.GP11, "b": board.GP12, "sw": board.GP13}, # Encoder 4
-]
-
-# Debounce timing (in seconds)
-BUTTON_DEBOUNCE_TIME = 0.020  # 20ms debounce for buttons
-LOOP_DELAY = 0.001  # 1ms loop delay
+# All encoder pins form one contiguous block starting at PIN_BASE so the whole
+# bank can be sampled with a single PIO read.
+# Each encoder has: A (CLK), B (DT), SW (Button) on consecutive pins, so
+# encoder i uses pins PIN_BASE + 3*i .. PIN_BASE + 3*i + 2:
+#   Encoder 1: GP2, GP3, GP4      Encoder 3: GP8, GP9, GP10
+#   Encoder 2: GP5, GP6, GP7      Encoder 4: GP11, GP12, GP13
+PIN_BASE = board.GP2
+# The encoder count is fixed at 4: the sampler program reads exactly 12 pins
+# ("in pins, 12"), ButtonDebouncer has one lane per button, and the tasks
+# unroll the encoders into e0..e3, so PIN_COUNT must stay 12.
+PIN_COUNT = 12
+
+# Task timing (in seconds)
+POLL_INTERVAL = 0.001  # 1ms between encoder/button polls
 REPORT_INTERVAL = 0.010  # 10ms minimum between reports
 
-# Debug output to serial console
-DEBUG_ENABLED = True
+# Button debounce: a button changes state only after BUTTON_DEBOUNCE_SAMPLES
+# consecutive matching samples, taken every BUTTON_SAMPLE_POLLS polls
+# (5 samples x 4 polls x 1ms = about 20ms of stable contact)
+BUTTON_DEBOUNCE_SAMPLES = 5  # 1 to 6
+BUTTON_SAMPLE_POLLS = 4
+
+# Debug output to serial console (1 = enabled, 0 = disabled)
+# This is a compile-time constant: with 0 every debug branch, including its
+# string formatting, is removed when the file is compiled.
+_DEBUG = const(1)
+
+# ============================================================================
+# PIN SAMPLER
+# ============================================================================
+
+# PIO clock for the pin sampler. An unchanged sample takes 5 cycles, so the
+# pins are checked at 20 kHz - far faster than any hand-turned encoder.
+SAMPLER_FREQUENCY = 100_000
+
+# PIO program that watches all encoder pins and pushes a snapshot into the
+# RX FIFO every time any of them changes. The pins are inverted (they are
+# active-low) and packed into the low 12 bits of the word with PIN_BASE in
+# bit 0; the upper bits are always zero, so every snapshot stays a small int.
+# Y holds the last pushed snapshot. It starts as all ones, which no 12-bit
+# snapshot can match, so the first sample is always pushed.
+# The RX FIFO buffers up to 4 changes. If the CPU has not drained it by
+# then, the state machine stalls in "push block" and stops sampling, so
+# edges during the stall are lost; the poll task drains the FIFO every
+# POLL_INTERVAL to keep that from happening at hand-turning speeds.
+SAMPLER_PROGRAM = adafruit_pioasm.assemble("""
+    mov y, ~null
+sample:
+    mov isr, ~null
+    in pins, 12
+    mov x, ~isr
+    jmp x!=y changed
+    jmp sample
+changed:
+    mov y, x
+    mov isr, x
+    push block
+    jmp sample
+""")
+
+
+def create_pin_sampler():
+    """
+    Create the PIO state machine that captures every encoder pin change.
+    
+    The first snapshot is pushed as soon as the state machine starts.
+    
+    Returns:
+        rp2pio.StateMachine with pull-ups enabled on all encoder pins
+    """
+    return rp2pio.StateMachine(
+        SAMPLER_PROGRAM,
+        frequency=SAMPLER_FREQUENCY,
+        first_in_pin=PIN_BASE,
+        in_pin_count=PIN_COUNT,
+        pull_in_pin_up=(1 << PIN_COUNT) - 1,
+        in_shift_right=False,
+    )
+
+
+# ============================================================================
+# BUTTON DEBOUNCER
+# ============================================================================
+
+# History layout: each button gets a lane of BUTTON_DEBOUNCE_SAMPLES sample
+# bits plus one spare carry bit, and lane i starts at bit i * _LANE. With at
+# most 6 samples the whole word stays below bit 30, i.e. a small int.
+_LANE = BUTTON_DEBOUNCE_SAMPLES + 1
+_LANE_2 = 2 * _LANE
+_LANE_3 = 3 * _LANE
+_LANE_LSB = 1 | (1 << _LANE) | (1 << _LANE_2) | (1 << _LANE_3)
+_LANE_SAMPLES = ((1 << BUTTON_DEBOUNCE_SAMPLES) - 1) * _LANE_LSB
+_LANE_CARRY = _LANE_LSB << BUTTON_DEBOUNCE_SAMPLES
+# Shifts that move lane i's carry bit down to bit i
+_PACK_1 = _LANE + BUTTON_DEBOUNCE_SAMPLES - 1
+_PACK_2 = _LANE_2 + BUTTON_DEBOUNCE_SAMPLES - 2
+_PACK_3 = _LANE_3 + BUTTON_DEBOUNCE_SAMPLES - 3
+
+
+class ButtonDebouncer:
+    """
+    Debounces all 4 encoder push buttons at once.
+    
+    Each button keeps a shift register of its last BUTTON_DEBOUNCE_SAMPLES
+    samples in one lane of a single int, so every button is updated with
+    the same handful of bitwise operations. A sample is taken every
+    BUTTON_SAMPLE_POLLS polls, and a button only changes state once all
+    of its samples agree.
+    """
+    
+    def __init__(self):
+        """Initialize with every button released."""
+        self.history = 0  # Lane i holds the sample history of button i
+        self.stable = 0   # Carry bit of lane i is set while button i is pressed
+        self.pressed = 0  # Bit i is set while button i is pressed
+        self._countdown = BUTTON_SAMPLE_POLLS
+    
+    def update(self, state):
+        """
+        Shift the latest pin snapshot into every button's history.
+        
+        Should be called once per poll; only every BUTTON_SAMPLE_POLLS-th
+        call takes a sample, so the debounce time is independent of how
+        often the encoders are polled.
+        
+        Args:
+            state: Sampled pin word (SW of encoder i at bit 3*i + 2)
+        
+        Returns:
+            Bitmask of buttons whose debounced state changed (bit i = button i)
+        """
+        countdown = self._countdown - 1
+        if countdown:
+            self._countdown = countdown
+            return 0
+        self._countdown = BUTTON_SAMPLE_POLLS
+        
+        # Move each SW bit to bit 0 of its lane, then shift every lane's
+        # history by one sample, dropping the oldest
+        bits = (((state >> 2) & 1) | (((state >> 5) & 1) << _LANE) |
+                (((state >> 8) & 1) << _LANE_2) | (((state >> 11) & 1) << _LANE_3))
+        history = ((self.history << 1) & _LANE_SAMPLES) | bits
+        self.history = history
+        
+        # Adding 1 to a lane carries out only if every sample is pressed;
+        # adding all ones carries out if any sample is pressed
+        all_on = (history + _LANE_LSB) & _LANE_CARRY
+        any_on = (history + _LANE_SAMPLES) & _LANE_CARRY
+        
+        # Buttons only change state once their history is unanimous
+        stable = (self.stable | all_on) & any_on
+        self.stable = stable
+        
+        # Pack the carry bit of each lane into a 4-bit mask
+        pressed = (((stable >> BUTTON_DEBOUNCE_SAMPLES) & 1) | ((stable >> _PACK_1) & 2) |
+                   ((stable >> _PACK_2) & 4) | ((stable >> _PACK_3) & 8))
+        changed = pressed ^ self.pressed
+        self.pressed = pressed
+        
+        if _DEBUG:
+            if changed:
+                for i in range(4):
+                    if changed & (1 << i):
+                        action = "pressed" if pressed & (1 << i) else "released"
+                        print(f"Encoder {i + 1}: Button {action}")
+        
+        return changed
+
 
 # ============================================================================
 # ENCODER CLASS (Generic HID version)
@@ -59,135 +215,93 @@ class Encoder:
     """
     Handles a single rotary encoder with push button for Generic HID mode.
     
-    Uses quadrature decoding to detect rotation direction and
-    software debouncing for the push button. Returns raw movement
+    Uses quadrature decoding to detect rotation direction. The push
+    button is debounced separately by ButtonDebouncer. Returns raw movement
     values instead of sending keyboard events.
     """
     
-    # Quadrature state transition table
-    # Maps (previous_state, current_state) to direction
-    # +1 = clockwise, -1 = counter-clockwise, 0 = no valid transition
-    TRANSITION_TABLE = {
-        (0b00, 0b01): +1,
-        (0b01, 0b11): +1,
-        (0b11, 0b10): +1,
-        (0b10, 0b00): +1,
-        (0b00, 0b10): -1,
-        (0b10, 0b11): -1,
-        (0b11, 0b01): -1,
-        (0b01, 0b00): -1,
-    }
+    # Quadrature state transition lookup table
+    # Indexed by (previous_state << 2) | current_state, where each state
+    # is (B << 1) | A as read straight from the sampled pin word
+    # 0x01 = clockwise, 0xFF = counter-clockwise, 0x00 = no valid transition
+    _QDEC_LUT = bytes([
+        0x00, 0xFF, 0x01, 0x00,  # from 0b00
+        0x01, 0x00, 0x00, 0xFF,  # from 0b01
+        0xFF, 0x00, 0x00, 0x01,  # from 0b10
+        0x00, 0x01, 0xFF, 0x00,  # from 0b11
+    ])
     
-    def __init__(self, pin_a, pin_b, pin_sw, encoder_id=0):
+    def __init__(self, index, state):
         """
         Initialize an encoder instance.
         
         Args:
-            pin_a: GPIO pin for encoder A (CLK)
-            pin_b: GPIO pin for encoder B (DT)
-            pin_sw: GPIO pin for encoder push button (SW)
-            encoder_id: Identifier for debug output
+            index: Zero-based encoder number; pin A is at bit 3*index of
+                the sampled pin word and B at the following bit
+            state: Initial sampled pin word
         """
-        self.encoder_id = encoder_id
-        
-        # Initialize pin A
-        self.pin_a = digitalio.DigitalInOut(pin_a)
-        self.pin_a.direction = digitalio.Direction.INPUT
-        self.pin_a.pull = digitalio.Pull.UP
-        
-        # Initialize pin B
-        self.pin_b = digitalio.DigitalInOut(pin_b)
-        self.pin_b.direction = digitalio.Direction.INPUT
-        self.pin_b.pull = digitalio.Pull.UP
+        self.encoder_id = index + 1  # For debug output
         
-        # Initialize button pin
-        self.pin_sw = digitalio.DigitalInOut(pin_sw)
-        self.pin_sw.direction = digitalio.Direction.INPUT
-        self.pin_sw.pull = digitalio.Pull.UP
+        # Bit position within the sampled pin word
+        self._bit_offset = 3 * index
         
         # Encoder state tracking
-        self.last_ab_state = self._read_ab_state()
+        self.last_ab_state = (state >> self._bit_offset) & 0b11
         self.steps = 0
         self.accumulated_movement = 0
-        
-        # Button state tracking
-        self.last_button_state = self.pin_sw.value  # True = not pressed (pull-up)
-        self.button_pressed = False
-        self.last_button_time = time.monotonic()
-    
-    def _read_ab_state(self):
-        """Read current A/B state as 2-bit value."""
-        # Pins are active-low, so invert the reading
-        a_val = 0 if self.pin_a.value else 1
-        b_val = 0 if self.pin_b.value else 1
-        return (a_val << 1) | b_val
     
-    def update(self):
+    def update(self, state):
         """
-        Update encoder state.
+        Decode rotation from a captured pin snapshot.
         
-        Should be called frequently in the main loop.
-        Returns tuple: (movement, button_pressed)
-          - movement: Signed int (-127 to +127) for rotation since last report
-          - button_pressed: Boolean True if button is currently pressed
+        Should be called for every snapshot drained from the pin sampler.
+        Completed detents are accumulated until get_and_clear_movement().
         """
+        # Every self.x access is a dict lookup in CircuitPython, so read
+        # attributes into locals once and write back only what changed
+        last_ab_state = self.last_ab_state
+        
         # Process encoder rotation
-        current_ab_state = self._read_ab_state()
+        # The sampler already inverted the active-low pins
+        current_ab_state = (state >> self._bit_offset) & 0b11
         
-        if current_ab_state != self.last_ab_state:
+        if current_ab_state != last_ab_state:
             # Look up transition in table
-            transition = (self.last_ab_state, current_ab_state)
-            direction = self.TRANSITION_TABLE.get(transition, 0)
+            direction = self._QDEC_LUT[(last_ab_state << 2) | current_ab_state]
             
-            if direction != 0:
-                self.steps += direction
+            if direction:
+                if direction == 0xFF:
+                    direction = -1
+                steps = self.steps + direction
                 
                 # Most encoders have 4 state changes per detent
-                # Accumulate movement when a full detent is completed
-                if self.steps >= 4:
-                    self.accumulated_movement += 1
-                    self.steps = 0
-                    if DEBUG_ENABLED:
+                # Accumulate movement when a full detent is completed,
+                # saturating at the signed byte range of the HID report
+                if steps >= 4:
+                    if self.accumulated_movement < 127:
+                        self.accumulated_movement += 1
+                    steps = 0
+                    if _DEBUG:
                         print(f"Encoder {self.encoder_id}: CW detent")
-                elif self.steps <= -4:
-                    self.accumulated_movement -= 1
-                    self.steps = 0
-                    if DEBUG_ENABLED:
+                elif steps <= -4:
+                    if self.accumulated_movement > -127:
+                        self.accumulated_movement -= 1
+                    steps = 0
+                    if _DEBUG:
                         print(f"Encoder {self.encoder_id}: CCW detent")
+                
+                self.steps = steps
             
             self.last_ab_state = current_ab_state
-        
-        # Process button press with debounce
-        current_button_state = self.pin_sw.value
-        current_time = time.monotonic()
-        
-        # Button is active-low (pressed = False/low)
-        if current_button_state != self.last_button_state:
-            if (current_time - self.last_button_time) >= BUTTON_DEBOUNCE_TIME:
-                self.last_button_time = current_time
-                self.last_button_state = current_button_state
-                
-                # Detect falling edge (button press)
-                if not current_button_state and not self.button_pressed:
-                    self.button_pressed = True
-                    if DEBUG_ENABLED:
-                        print(f"Encoder {self.encoder_id}: Button pressed")
-                # Detect rising edge (button release)
-                elif current_button_state and self.button_pressed:
-                    self.button_pressed = False
-                    if DEBUG_ENABLED:
-                        print(f"Encoder {self.encoder_id}: Button released")
-        
-        return self.button_pressed
     
     def get_and_clear_movement(self):
         """
         Get accumulated movement since last call and reset counter.
         
         Returns:
-            Signed int clamped to -127 to +127 range
+            Signed int in -127 to +127 range (clamped by update())
         """
-        movement = max(-127, min(127, self.accumulated_movement))
+        movement = self.accumulated_movement
         self.accumulated_movement = 0
         return movement
 
@@ -210,21 +324,99 @@ def find_generic_hid_device():
     return None
 
 
-def signed_to_unsigned_byte(value):
+# ============================================================================
+# TASKS
+# ============================================================================
+
+async def poll_loop(sampler, sample, encoders, buttons):
     """
-    Convert a signed integer to an unsigned byte using two's complement.
+    Decode encoder snapshots and debounce buttons every POLL_INTERVAL.
     
     Args:
-        value: Signed integer in range -127 to +127
+        sampler: Pin sampler state machine from create_pin_sampler()
+        sample: One-word array holding the latest pin snapshot
+        encoders: List of Encoder instances
+        buttons: ButtonDebouncer shared with report_loop()
+    """
+    # The firmware always drives exactly 4 encoders, so the hot loop calls
+    # them directly instead of iterating
+    e0, e1, e2, e3 = encoders
     
-    Returns:
-        Unsigned byte (0-255) representing the two's complement value.
-        This is needed because send_report expects unsigned bytes, but we
-        want to transmit signed movement values.
+    while True:
+        # Decode every snapshot the sampler buffered since the last poll
+        while sampler.in_waiting:
+            sampler.readinto(sample)
+            state = sample[0]
+            e0.update(state)
+            e1.update(state)
+            e2.update(state)
+            e3.update(state)
+        
+        # Debounce all buttons from the latest snapshot
+        buttons.update(sample[0])
+        
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def report_loop(hid_device, encoders, buttons):
     """
-    if value < 0:
-        return (256 + value) & 0xFF
-    return value & 0xFF
+    Build and send the HID report every REPORT_INTERVAL.
+    
+    Args:
+        hid_device: Generic HID usb_hid.Device
+        encoders: List of Encoder instances
+        buttons: ButtonDebouncer updated by poll_loop()
+    """
+    # HID report buffer (7 bytes, report ID is handled separately)
+    # [Enc1][Enc2][Enc3][Enc4][Buttons][Reserved][Reserved]
+    # Both buffers are reused for every report to keep the loop allocation-free.
+    # Signed byte arrays store negative movement directly, and send_report
+    # accepts any buffer, so no unsigned conversion is needed.
+    report = array.array("b", bytes(7))
+    last_report = array.array("b", bytes(7))
+    e0, e1, e2, e3 = encoders
+    
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        
+        # Build the HID report
+        report[0] = e0.get_and_clear_movement()
+        report[1] = e1.get_and_clear_movement()
+        report[2] = e2.get_and_clear_movement()
+        report[3] = e3.get_and_clear_movement()
+        
+        report[4] = buttons.pressed  # Button states
+        report[5] = 0x00             # Reserved
+        report[6] = 0x00             # Reserved
+        
+        # Only send if there's movement or something changed since the last
+        # report. OR-ing the movement bytes gives one int to test, and the
+        # array comparison only runs (in C, without allocating) when idle.
+        # Movement must be tested on its own: two identical movement reports
+        # in a row are both real and must both be sent.
+        moved = report[0] | report[1] | report[2] | report[3]
+        
+        if moved or report != last_report:
+            try:
+                hid_device.send_report(report)
+                if _DEBUG:
+                    if moved:
+                        print(f"Report: Enc[{report[0]:4d},{report[1]:4d},{report[2]:4d},{report[3]:4d}] Btn=0x{report[4]:02X}")
+            except Exception as e:
+                if _DEBUG:
+                    print(f"Error sending report: {e}")
+            
+            last_report[:] = report
+
+
+async def run_tasks(sampler, sample, encoders, buttons, hid_device):
+    """Run the polling and reporting tasks side by side."""
+    # CircuitPython asyncio is cooperative and single-threaded, so the
+    # shared encoders and debouncer need no locking
+    await asyncio.gather(
+        asyncio.create_task(poll_loop(sampler, sample, encoders, buttons)),
+        asyncio.create_task(report_loop(hid_device, encoders, buttons)),
+    )
 
 
 # ============================================================================
@@ -234,7 +426,7 @@ def signed_to_unsigned_byte(value):
 def main():
     """Main entry point."""
     print("RotaryUsb Generic HID Firmware Starting...")
-    print(f"Debug output: {'Enabled' if DEBUG_ENABLED else 'Disabled'}")
+    print(f"Debug output: {'Enabled' if _DEBUG else 'Disabled'}")
     
     # Find the Generic HID device
     hid_device = find_generic_hid_device()
@@ -248,68 +440,28 @@ def main():
     
     print(f"Generic HID device found: Usage Page 0x{hid_device.usage_page:04X}")
     
+    # Initialize the PIO pin sampler and wait for its first snapshot
+    sampler = create_pin_sampler()
+    sample = array.array("L", [0])
+    sampler.readinto(sample)
+    print(f"Pin sampler initialized: {PIN_COUNT} pins from {PIN_BASE}")
+    
+    buttons = ButtonDebouncer()
+    
     # Create encoder instances
     encoders = []
-    for i, pins in enumerate(ENCODER_PINS):
+    for i in range(4):
         encoder = Encoder(
-            pin_a=pins["a"],
-            pin_b=pins["b"],
-            pin_sw=pins["sw"],
-            encoder_id=i + 1
+            index=i,
+            state=sample[0]
         )
         encoders.append(encoder)
-        print(f"Encoder {i + 1} initialized: A={pins['a']}, B={pins['b']}, SW={pins['sw']}")
+        print(f"Encoder {i + 1} initialized: A=bit {3 * i}, B=bit {3 * i + 1}, SW=bit {3 * i + 2}")
     
-    print("All encoders initialized. Starting main loop...")
+    print("All encoders initialized. Starting tasks...")
     print("-" * 40)
     
-    # HID report buffer (7 bytes, report ID is handled separately)
-    # [Enc1][Enc2][Enc3][Enc4][Buttons][Reserved][Reserved]
-    report = bytearray(7)
-    last_report_time = time.monotonic()
-    last_report = bytearray(7)
-    
-    # Main loop
-    while True:
-        # Update all encoders
-        button_states = 0
-        for i, encoder in enumerate(encoders):
-            btn_pressed = encoder.update()
-            if btn_pressed:
-                button_states |= (1 << i)
-        
-        current_time = time.monotonic()
-        
-        # Send report at regular intervals or when state changes
-        if (current_time - last_report_time) >= REPORT_INTERVAL:
-            # Build the HID report
-            for i, encoder in enumerate(encoders):
-                movement = encoder.get_and_clear_movement()
-                report[i] = signed_to_unsigned_byte(movement)
-            
-            report[4] = button_states  # Button states
-            report[5] = 0x00           # Reserved
-            report[6] = 0x00           # Reserved
-            
-            # Only send if something changed or there's movement
-            has_movement = any(report[i] != 0 for i in range(4))
-            has_change = report != last_report
-            
-            if has_movement or has_change:
-                try:
-                    hid_device.send_report(report)
-                    if DEBUG_ENABLED and has_movement:
-                        print(f"Report: Enc[{report[0]:3d},{report[1]:3d},{report[2]:3d},{report[3]:3d}] Btn=0x{report[4]:02X}")
-                except Exception as e:
-                    if DEBUG_ENABLED:
-                        print(f"Error sending report: {e}")
-                
-                last_report = bytearray(report)
-            
-            last_report_time = current_time
-        
-        # Small delay to prevent CPU hogging
-        time.sleep(LOOP_DELAY)
+    asyncio.run(run_tasks(sampler, sample, encoders, buttons, hid_device))
 
 
 # Run the main program